@@ -25,9 +25,9 @@ if sys.version_info < (3, 9):
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.gzip import GZipMiddleware
-from fastapi.responses import ORJSONResponse
 from fastapi.openapi.utils import get_openapi
 
+from src.wirecloud.commons.utils.orjson_response import ORJSONResponse
 from src.wirecloud.database import close
 from src.wirecloud.platform.plugins import get_plugins, get_extra_openapi_schemas
 from src.wirecloud import docs
@@ -18,7 +18,6 @@
 # along with Wirecloud.  If not, see <http://www.gnu.org/licenses/>.
 
 import os
-import markdown
 from typing import Optional
 from fastapi import APIRouter, Path, Query, Request, Response
 from urllib.parse import urljoin
@@ -284,7 +283,7 @@ async def delete_resource_version(db: DBDep,
 
     if resource is None:
         raise NotFound()
-    elif not await resource.is_removable_by(db, user, vendor=True):
+    elif not resource.is_removable_by(db, user, vendor=True):
         # TODO Add translation
         msg = "user %(username)s is not the owner of the resource %(resource_id)s" % {
             'username': user.username, 'resource_id': '{}/{}/{}'.format(vendor, name, version)}
@@ -356,8 +355,7 @@ async def get_resource_changelog(db: DBDep,
             msg = 'Error opening the changelog file'
             doc_code = '<div class="margin-top: 10px"><p>%s</p></div>' % msg
 
-    doc_pre_html = markdown.markdown(doc_code, output_format='xhtml',
-                                     extensions=['markdown.extensions.codehilite', 'markdown.extensions.fenced_code'])
+    doc_pre_html = catalogue_utils.markdown_doc_converter.reset().convert(doc_code)
 
     if from_version is not None:
         doc_pre_html = filter_changelog(doc_pre_html, VersionType(from_version))
@@ -434,8 +432,7 @@ async def get_resource_user_guide(db: DBDep,
                 msg = 'Error opening the userguide file'
                 doc_code = '<div class="margin-top: 10px"><p>%s</p></div>' % msg
 
-    doc_pre_html = markdown.markdown(doc_code, output_format='xhtml',
-                                     extensions=['markdown.extensions.codehilite', 'markdown.extensions.fenced_code'])
+    doc_pre_html = catalogue_utils.markdown_doc_converter.reset().convert(doc_code)
     doc = clean_html(doc_pre_html, base_url=doc_base_url)
 
     return Response(
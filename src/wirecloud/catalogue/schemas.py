@@ -61,13 +61,13 @@ class CatalogueResourceBase(BaseModel):
         return self.vendor + '/' + self.short_name + '/' + self.version
 
     # TODO Take into account user permissions too
-    async def is_removable_by(self, db: DBSession, user: UserAll, vendor: bool = False) -> bool:
+    def is_removable_by(self, db: DBSession, user: UserAll, vendor: bool = False) -> bool:
         from src.wirecloud.catalogue.utils import check_vendor_permissions
 
         if user.is_superuser:
             return True
         else:
-            return vendor is False or await check_vendor_permissions(db, user, self.vendor)
+            return vendor is False or check_vendor_permissions(db, user, self.vendor)
 
     # TODO Take into account user permissions too
     async def is_available_for(self, db: DBSession, user: UserAll) -> bool:
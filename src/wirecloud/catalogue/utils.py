@@ -53,6 +53,14 @@ from src.wirecloud.database import DBSession
 
 wgt_deployer: WgtDeployer = WgtDeployer(settings.CATALOGUE_MEDIA_ROOT)
 
+# markdown.markdown() builds a brand new Markdown instance (extension
+# registration and lexer setup included) on every call, so shared instances
+# are kept at module level and reset between conversions
+markdown_converter: markdown.Markdown = markdown.Markdown(output_format='xhtml')
+markdown_doc_converter: markdown.Markdown = markdown.Markdown(output_format='xhtml',
+                                                              extensions=['markdown.extensions.codehilite',
+                                                                          'markdown.extensions.fenced_code'])
+
 
 def extract_resource_media_from_package(template: TemplateParser, package: WgtFile, base_path: str) -> dict[str, str]:
     overrides = {}
@@ -104,8 +112,7 @@ def check_invalid_doc_entry(wgt_file: WgtFile, doc_path: str) -> None:
         raise InvalidContents('file is not encoded using UTF-8: %s' % doc_path)
 
     try:
-        markdown.markdown(doc_code, output_format='xhtml', extensions=['markdown.extensions.codehilite',
-                                                                       'markdown.extensions.fenced_code'])
+        markdown_doc_converter.reset().convert(doc_code)
     except Exception:
         raise InvalidContents("file cannot be parsed as markdown: %s" % doc_path)
 
@@ -276,11 +283,11 @@ async def get_resource_data(db: DBSession, resource: CatalogueResource, user: Op
 
         try:
             description_code = download_local_file(localized_longdescription_path).decode('utf-8')
-            longdescription = clean_html(markdown.markdown(description_code, output_format='xhtml'), base_url=longdescription_base_url)
+            longdescription = clean_html(markdown_converter.reset().convert(description_code), base_url=longdescription_base_url)
         except Exception:
             try:
                 description_code = download_local_file(longdescription_path).decode('utf-8')
-                longdescription = clean_html(markdown.markdown(description_code, output_format='xhtml'), base_url=longdescription_base_url)
+                longdescription = clean_html(markdown_converter.reset().convert(description_code), base_url=longdescription_base_url)
             except Exception:
                 longdescription = resource_info.description
     else:
@@ -324,10 +331,13 @@ async def get_resource_group_data(db: DBSession, resources: list[CatalogueResour
         versions=[]
     )
 
+    base_fields = CatalogueResourceDataSummaryBase.model_fields
     for resource in resources:
         current_resource_data = await get_resource_data(db, resource, user, request)
-        current_resource_data_base = current_resource_data.model_dump(exclude={'vendor', 'name', 'type'})
-        data.versions.append(CatalogueResourceDataSummaryBase(**current_resource_data_base))
+        # The data is already validated, so the base summary can be built in a
+        # single pass over the fields without a model_dump/revalidation cycle
+        data.versions.append(CatalogueResourceDataSummaryBase.model_construct(
+            **{field: getattr(current_resource_data, field) for field in base_fields}))
 
     return data
 
@@ -383,7 +393,7 @@ async def update_resource_catalogue_cache(db: DBSession) -> None:
 
 
 # TODO Use user permissions apart from these checks
-async def check_vendor_permissions(db: DBSession, user: Optional[UserAll], vendor: str) -> bool:
+def check_vendor_permissions(db: DBSession, user: Optional[UserAll], vendor: str) -> bool:
     if user is None:
         return False
 
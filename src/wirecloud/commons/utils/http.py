@@ -1,5 +1,4 @@
 # -*- coding: utf-8 -*-
-import re
 # Copyright (c) 2012-2016 CoNWeT Lab., Universidad Politécnica de Madrid
 
 # This file is part of Wirecloud.
@@ -19,19 +18,21 @@ import re
 
 # TODO Add HTML response
 
+import hashlib
 import socket
+import stat
 import orjson as json
 import inspect
 import posixpath
 import os
-from functools import wraps
-from lxml import etree
+from functools import lru_cache, wraps
+from xml.sax.saxutils import escape
 from fastapi import Request, Response
 from fastapi.responses import FileResponse
 from pydantic import BaseModel
 from typing import Optional, Union, Any
 from collections.abc import Callable
-from urllib.parse import urljoin, unquote, urlparse, quote
+from urllib.parse import urljoin, unquote, urlparse, quote, quote_from_bytes
 
 from src.wirecloud.commons.utils import mimeparser
 
@@ -53,54 +54,53 @@ class NotFound(Exception):
     pass
 
 
-def get_xml_error_response(request: Optional[Request], mimetype: str, status_code: int, context: dict) -> str:
-    doc = etree.Element('error')
+def get_xml_error_response(request: Optional[Request], mimetype: str, status_code: int, context: dict) -> bytes:
+    # The error document schema is tiny and fixed, so it is assembled into a
+    # flat bytearray instead of paying for an lxml element tree
+    buf = bytearray(b'<error><description>')
+    buf += escape(str(context['error_msg'])).encode('utf-8')
+    buf += b'</description>'
 
-    description = etree.Element('description')
-    description.text = str(context['error_msg'])
-
-    doc.append(description)
-
-    if context.get('details') is not None:
-        details_element = etree.Element('details')
-        if isinstance(context['details'], str):
-            details_element.text = context['details']
+    details = context.get('details')
+    if details is not None:
+        buf += b'<details>'
+        if isinstance(details, str):
+            buf += escape(details).encode('utf-8')
         else:
-            for key in context['details']:
-                element = etree.Element(key)
-
-                if isinstance(context['details'][key], str):
-                    element.text = context['details'][key]
-                elif hasattr(context['details'][key], '__iter__'):
-                    for value in context['details'][key]:
-                        list_element = etree.Element('element')
-                        list_element.text = value
-                        element.append(list_element)
+            for key, value in details.items():
+                key_bytes = key.encode('utf-8')
+                buf += b'<' + key_bytes + b'>'
+
+                if isinstance(value, str):
+                    buf += escape(value).encode('utf-8')
+                elif isinstance(value, dict):
+                    for key2, value2 in value.items():
+                        key2_bytes = key2.encode('utf-8')
+                        buf += b'<' + key2_bytes + b'>' + escape(value2).encode('utf-8') + b'</' + key2_bytes + b'>'
                 else:
-                    for key2 in context['details'][key]:
-                        list_element = etree.Element(key2)
-                        list_element.text = context['details'][key][key2]
-                        element.append(list_element)
+                    for element in value:
+                        buf += b'<element>' + escape(element).encode('utf-8') + b'</element>'
 
-                details_element.append(element)
+                buf += b'</' + key_bytes + b'>'
+        buf += b'</details>'
 
-        doc.append(details_element)
+    buf += b'</error>'
 
-    return etree.tostring(doc, pretty_print=False, method='xml')
+    return bytes(buf)
 
 
-def get_json_error_response(request: Optional[Request], mimetype: str, status_code: int, context: dict) -> str:
+def get_json_error_response(request: Optional[Request], mimetype: str, status_code: int, context: dict) -> bytes:
     body = {
         'description': str(context['error_msg'])
     }
     if context.get('details') is not None:
         body['details'] = context['details']
 
-    return json.dumps(body).decode("utf-8")
+    return json.dumps(body)
 
 
-def get_plain_text_error_response(request: Optional[Request], mimetype: str, status_code: int, context: dict) -> str:
-    return "%s" % context['error_msg']
+def get_plain_text_error_response(request: Optional[Request], mimetype: str, status_code: int, context: dict) -> bytes:
+    return ("%s" % context['error_msg']).encode("utf-8")
 
 
 ERROR_FORMATTERS = {
@@ -112,20 +112,64 @@ ERROR_FORMATTERS = {
     '': get_plain_text_error_response,  # Fallback
 }
 
+_ERROR_FORMATTER_KEYS = tuple(key for key in ERROR_FORMATTERS if key != '')
+# Parallel dispatch tables for the default formatters; the trailing '' entry
+# is the plain text fallback used when content negotiation fails
+_ERROR_FORMATTER_CONTENT_TYPES = _ERROR_FORMATTER_KEYS + ('',)
+_ERROR_FORMATTER_FUNCS = tuple(ERROR_FORMATTERS[key] for key in _ERROR_FORMATTER_CONTENT_TYPES)
+_JSON_FORMATTER_IDX = _ERROR_FORMATTER_CONTENT_TYPES.index('application/json; charset=utf-8')
+_DEFAULT_FORMATTER_IDX = len(_ERROR_FORMATTER_KEYS) - 1
+
+
+@lru_cache(maxsize=1024)
+def _best_match_cached(supported: tuple[str, ...], accept_header: str) -> str:
+    # Clients tend to send the same Accept header over and over, so the
+    # result of negotiating against a given candidate list is memoized
+    return mimeparser.best_match(list(supported), accept_header)
+
+
+@lru_cache(maxsize=1024)
+def _match_error_formatter(accept_header: str) -> int:
+    content_type = mimeparser.best_match(list(_ERROR_FORMATTER_KEYS), accept_header)
+    return _ERROR_FORMATTER_CONTENT_TYPES.index(content_type)
+
 
 def build_response(request: Request, status_code: int, context: Union[dict[str, Any]], formatters: dict[str, Callable],
                    headers: dict[str, str] = None) -> Response:
-    if request.headers.get('X-Requested-With', '') == 'XMLHttpRequest':
-        content_type = 'application/json; charset=utf-8'
-    else:
-        formatter_keys = list(formatters.keys())
-        formatter_keys.remove('')
-        content_type = mimeparser.best_match(formatter_keys, request.headers.get('Accept', '*/*'))
+    if formatters is ERROR_FORMATTERS:
+        # Common case (no extra formats): dispatch through the precomputed
+        # parallel tuples using an integer index instead of hashing the full
+        # content-type string against the formatters dict
+        if request.headers.get('X-Requested-With', '') == 'XMLHttpRequest':
+            idx = _JSON_FORMATTER_IDX
+        else:
+            accept_header = request.headers.get('Accept', '*/*')
+            if accept_header in ('', '*/*'):
+                # Every candidate ties for clients not expressing a
+                # preference, so the most desirable (last) one wins without
+                # running the mime parser
+                idx = _DEFAULT_FORMATTER_IDX
+            else:
+                idx = _match_error_formatter(accept_header)
 
-    if content_type in formatters:
-        formatter = formatters[content_type]
+        content_type = _ERROR_FORMATTER_CONTENT_TYPES[idx]
+        formatter = _ERROR_FORMATTER_FUNCS[idx]
     else:
-        raise Exception('No suitable formatter found')
+        if request.headers.get('X-Requested-With', '') == 'XMLHttpRequest':
+            content_type = 'application/json; charset=utf-8'
+        else:
+            formatter_keys = tuple(key for key in formatters if key != '')
+
+            accept_header = request.headers.get('Accept', '*/*')
+            if accept_header in ('', '*/*'):
+                content_type = formatter_keys[-1]
+            else:
+                content_type = _best_match_cached(formatter_keys, accept_header)
+
+        if content_type in formatters:
+            formatter = formatters[content_type]
+        else:
+            raise Exception('No suitable formatter found')
 
     body = formatter(request, content_type, status_code, context)
     response = Response(content=body, status_code=status_code, media_type=content_type)
@@ -155,15 +199,23 @@ def build_error_response(request: Request, status_code: int, error_msg: str, ext
     return build_response(request, status_code, context, formatters, headers)
 
 
+@lru_cache(maxsize=256)
+def _parse_content_type(content_type_header: str) -> tuple[str, dict[str, str]]:
+    try:
+        return mimeparser.parse_mime_type(content_type_header)
+    except mimeparser.InvalidMimeType:
+        return '', {}
+
+
 def get_content_type(request: Request) -> tuple[str, dict[str, str]]:
+    # Keep-alive clients repeat the same Content-Type header on every
+    # request, so the parse (and the exception for invalid values) is
+    # memoized per header string
     content_type_header = request.headers.get('Content-Type', None)
-    if content_type_header is not None:
-        try:
-            return mimeparser.parse_mime_type(content_type_header)
-        except mimeparser.InvalidMimeType:
-            pass
+    if content_type_header is None:
+        return '', {}
 
-    return '', {}
+    return _parse_content_type(content_type_header)
 
 
 def build_not_found_response(request: Request) -> Response:
@@ -183,45 +235,62 @@ def build_permission_denied_response(request: Request, error_msg: str) -> Respon
 
 
 def check_decorator_params(handler, params):
+    # The parameter name set is cached on the handler (wraps propagates it
+    # through stacked decorators), so the signature is only built once no
+    # matter how many decorators inspect the same handler
+    sig_params = getattr(handler, '_wc_sig_params', None)
+    if sig_params is None:
+        sig_params = frozenset(inspect.signature(handler).parameters)
+        handler._wc_sig_params = sig_params
+
     for param_name in params:
-        if param_name not in inspect.signature(handler).parameters and ("_" + param_name) not in inspect.signature(handler).parameters:
+        if param_name not in sig_params and ("_" + param_name) not in sig_params:
             raise ValueError('The handler must have a %s parameter' % param_name)
 
+    return sig_params
+
 
 def authentication_required(handler):
     # Check that the handler has a user and request parameter
-    check_decorator_params(handler, ['user', 'request'])
+    sig_params = check_decorator_params(handler, ['user', 'request'])
+    is_async = inspect.iscoroutinefunction(handler)
+    user_kwarg = 'user' if 'user' in sig_params else '_user'
+    request_kwarg = 'request' if 'request' in sig_params else '_request'
 
     @wraps(handler)
     async def wrapper(*args, **kwargs):
         from src.wirecloud.commons.auth.schemas import UserAll
 
-        user: Optional[UserAll] = kwargs.get('user', kwargs.get('_user'))
-        request: Request = kwargs.get('request', kwargs.get('_request'))
+        user: Optional[UserAll] = kwargs.get(user_kwarg)
+        request: Request = kwargs.get(request_kwarg)
 
         if user is None:
             return build_error_response(request, 401, 'Authentication Required')
+        elif is_async:
+            return await handler(*args, **kwargs)
         else:
-            is_async = inspect.iscoroutinefunction(handler)
-
-            if is_async:
-                return await handler(*args, **kwargs)
-            else:
-                return handler(*args, **kwargs)
+            return handler(*args, **kwargs)
 
     return wrapper
 
 
 def produces(mime_types: list[str]):
     def wrap(handler):
-        check_decorator_params(handler, ['request'])
+        sig_params = check_decorator_params(handler, ['request'])
+        is_async = inspect.iscoroutinefunction(handler)
+        request_kwarg = 'request' if 'request' in sig_params else '_request'
+        supported = tuple(mime_types)
 
         @wraps(handler)
         async def wrapper(*args, **kwargs):
-            request: Request = kwargs.get('request', kwargs.get('_request'))
+            request: Request = kwargs.get(request_kwarg)
 
             accept_header = request.headers.get('Accept', '*/*')
-            setattr(request, 'best_response_mimetype', mimeparser.best_match(mime_types, accept_header))
+            if accept_header in ('', '*/*'):
+                # Fast path for clients not expressing a preference
+                setattr(request, 'best_response_mimetype', supported[-1])
+            else:
+                setattr(request, 'best_response_mimetype', _best_match_cached(supported, accept_header))
 
             if request.best_response_mimetype == '':
                 # TODO Add translations
@@ -229,8 +298,6 @@ def produces(mime_types: list[str]):
                 details = {'supported_mime_types': mime_types}
                 return build_error_response(request, 406, msg, details=details)
 
-            is_async = inspect.iscoroutinefunction(handler)
-
             if is_async:
                 return await handler(*args, **kwargs)
             else:
@@ -243,19 +310,19 @@ def produces(mime_types: list[str]):
 
 def consumes(mime_types: list[str]):
     def wrap(handler):
-        check_decorator_params(handler, ['request'])
+        sig_params = check_decorator_params(handler, ['request'])
+        is_async = inspect.iscoroutinefunction(handler)
+        request_kwarg = 'request' if 'request' in sig_params else '_request'
 
         @wraps(handler)
         async def wrapper(*args, **kwargs):
-            request: Request = kwargs.get('request', kwargs.get('_request'))
+            request: Request = kwargs.get(request_kwarg)
 
             setattr(request, 'mimetype', get_content_type(request)[0])
             if request.mimetype not in mime_types:
                 msg = "Unsupported request media type"
                 return build_error_response(request, 415, msg)
 
-            is_async = inspect.iscoroutinefunction(handler)
-
             if is_async:
                 return await handler(*args, **kwargs)
             else:
@@ -266,7 +333,9 @@ def consumes(mime_types: list[str]):
     return wrap
 
 
-_servername = None
+# Computed at import time: socket.getfqdn() can block on a reverse DNS lookup,
+# which must not happen inside the event loop while serving a request
+_servername = socket.getfqdn()
 
 
 def get_current_scheme(request: Optional[Request] = None) -> str:
@@ -291,12 +360,8 @@ def get_current_domain(request: Optional[Request] = None) -> str:
     if getattr(settings, 'FORCE_DOMAIN', None) is not None:
         servername = settings.FORCE_DOMAIN
     else:
-        try:
-            servername = request.url.hostname
-        except Exception:
-            global _servername
-            if _servername is None:
-                _servername = socket.getfqdn()
+        servername = request.url.hostname if request is not None else None
+        if servername is None:
             servername = _servername
 
     # Port
@@ -305,9 +370,8 @@ def get_current_domain(request: Optional[Request] = None) -> str:
     if getattr(settings, 'FORCE_PORT', None) is not None:
         port = int(settings.FORCE_PORT)
     else:
-        try:
-            port = request.url.port
-        except Exception:
+        port = request.url.port if request is not None else None
+        if port is None:
             port = 80 if scheme == 'http' else 443
 
     if (scheme == 'http' and port != 80) or (scheme == 'https' and port != 443):
@@ -322,41 +386,131 @@ def get_absolute_reverse_url(viewname: str, request: Optional[Request] = None, *
     return urljoin(get_current_scheme(request) + '://' + get_current_domain(request), url)
 
 
+class _ReverseKwargs(dict):
+    # Leaves placeholders without a supplied value as-is, mirroring the
+    # behaviour of the previous str.replace based implementation
+    def __missing__(self, key):
+        return '{' + key + '}'
+
+
+# Holds (plugin URL table, templates); see _resolve_url_cache for why the
+# table itself is kept instead of keying by its id()
+_reverse_url_cache: Optional[tuple[dict, dict[str, str]]] = None
+
+
 def get_relative_reverse_url(viewname: str, **kwargs) -> str:
     from src.wirecloud.platform.plugins import get_plugin_urls
 
+    global _reverse_url_cache
+
+    # Convert each urlpattern into a str.format template once per plugin URL
+    # table; building a URL is then a single format_map call instead of two
+    # replace passes per keyword argument
     patterns = get_plugin_urls()
-    if viewname not in patterns:
+    cached = _reverse_url_cache
+    if cached is None or cached[0] is not patterns:
+        # {param:path} and {param} placeholders collapse to the same field
+        templates = {name: url.urlpattern.replace(':path}', '}') for name, url in patterns.items()}
+        cached = (patterns, templates)
+        _reverse_url_cache = cached
+
+    template = cached[1].get(viewname)
+    if template is None:
         raise ValueError('No URL pattern found for view "%s"' % viewname)
 
-    url = patterns[viewname].urlpattern
-    for key in kwargs:
-        if '{' + f"{key}:path" + '}' in url:
-            url = url.replace('{' + f"{key}:path" + '}', kwargs[key])
-        else:
-            url = url.replace('{' + key + '}', str(kwargs[key]))
+    return template.format_map(_ReverseKwargs(kwargs))
 
-    return url
 
+# Trie node keys are path segments; the sentinels below cannot collide with
+# real segments because segments can never contain a '/'
+_TRIE_PARAM = '/param/'  # child node matching any single non-empty segment
+_TRIE_PATH = '/path/'    # URL name matching any non-empty remainder
+_TRIE_END = '/end/'      # URL name of a pattern ending at this node
 
-def resolve_url_name(path: str) -> Optional[str]:
-    from src.wirecloud.platform.plugins import get_plugin_urls
+# Holds (plugin URL table, trie); keeping the table itself in the cache makes
+# the identity check below reliable (an id() key could collide with a new dict
+# allocated at the address of the old, freed one after clear_cache)
+_resolve_url_cache: Optional[tuple[dict, dict]] = None
+
+
+def _add_url_pattern(trie: dict, name: str, urlpattern: str) -> None:
+    node = trie
+    for segment in urlpattern.split('/'):
+        if segment.startswith('{') and segment.endswith(':path}'):
+            # {param:path} segments are terminal in every plugin URL pattern
+            node.setdefault(_TRIE_PATH, name)
+            return
+        elif segment.startswith('{') and segment.endswith('}'):
+            segment = _TRIE_PARAM
+
+        node = node.setdefault(segment, {})
+
+    # setdefault keeps the first of two patterns sharing the same shape, as
+    # the linear scan over the URL table did
+    node.setdefault(_TRIE_END, name)
 
-    for name, url in get_plugin_urls().items():
-        # Check if the pattern matches the path, to do so, convert the pattern to a regex
-        pattern = re.escape(url.urlpattern).replace('\\{', '{').replace('\\}', '}')
-        pattern = re.sub(r'\{[^/]+:path}', r'(.+)', pattern)
-        pattern = re.sub(r'\{[^/]+}', r'([^/]+)', pattern)
-        pattern = '^' + pattern + '$'
 
-        if re.match(pattern, path):
+def _match_url_trie(node: dict, segments: list[str], index: int) -> Optional[str]:
+    if index == len(segments):
+        return node.get(_TRIE_END)
+
+    segment = segments[index]
+
+    # Literal segments take precedence over parameters
+    child = node.get(segment)
+    if child is not None:
+        name = _match_url_trie(child, segments, index + 1)
+        if name is not None:
             return name
 
+    if segment != '':
+        child = node.get(_TRIE_PARAM)
+        if child is not None:
+            name = _match_url_trie(child, segments, index + 1)
+            if name is not None:
+                return name
+
+    # A path parameter matches any non-empty remainder
+    if segment != '' or index < len(segments) - 1:
+        return node.get(_TRIE_PATH)
+
     return None
 
 
+def resolve_url_name(path: str) -> Optional[str]:
+    from src.wirecloud.platform.plugins import get_plugin_urls
+
+    global _resolve_url_cache
+
+    # Build a segment trie once per plugin URL table (it is rebuilt only when
+    # the plugin cache is cleared): resolving a path then walks one node per
+    # segment instead of running a regex over every pattern
+    plugin_urls = get_plugin_urls()
+    cached = _resolve_url_cache
+    if cached is None or cached[0] is not plugin_urls:
+        trie = {}
+        for name, url in plugin_urls.items():
+            _add_url_pattern(trie, name, url.urlpattern)
+
+        cached = (plugin_urls, trie)
+        _resolve_url_cache = cached
+
+    return _match_url_trie(cached[1], path.split('/'), 0)
+
+
+# Kept as a module constant so quote()'s internal per-safe-string quoter cache
+# hits on every call instead of being rebuilt for a fresh literal
+_IRI_SAFE_CHARS = "/#%[]=:;$&()+,!?*@'~"
+
+
 def iri_to_uri(iri: str) -> str:
-    return quote(iri, safe="/#%[]=:;$&()+,!?*@'~")
+    return quote(iri, safe=_IRI_SAFE_CHARS)
+
+
+def iri_to_uri_bytes(iri: bytes) -> str:
+    # Variant for callers that already hold UTF-8 bytes, skipping the
+    # str -> UTF-8 encode step performed by quote()
+    return quote_from_bytes(iri, safe=_IRI_SAFE_CHARS)
 
 
 def validate_url_param(name: str, value: str, force_absolute: bool = True, required: bool = False):
@@ -374,28 +528,52 @@ def validate_url_param(name: str, value: str, force_absolute: bool = True, requi
         raise ValueError(msg)
 
 
+@lru_cache(maxsize=512)
+def _downloadfile_stat(path: str) -> tuple[os.stat_result, str]:
+    # Only successful lookups are cached: raising propagates out of lru_cache
+    # without storing an entry, so a file missing today is re-checked once it
+    # gets deployed. Deployed entries are dropped through
+    # clear_downloadfile_cache() whenever a component is (un)deployed, as
+    # -dev resources are re-extracted over the same versioned directory
+    stat_result = os.stat(path)
+
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise IsADirectoryError(path)
+
+    # Same ETag FileResponse would derive from the stat result
+    etag_base = str(stat_result.st_mtime) + "-" + str(stat_result.st_size)
+    etag = '"%s"' % hashlib.md5(etag_base.encode()).hexdigest()
+
+    return stat_result, etag
+
+
+def clear_downloadfile_cache() -> None:
+    _downloadfile_stat.cache_clear()
+
+
 def build_downloadfile_response(request: Request, file_path: str, base_dir: str) -> Response:
     from src import settings
 
     path = posixpath.normpath(unquote(file_path))
     path = path.lstrip('/')
-    newpath = ''
-    for part in path.split('/'):
-        drive, part = os.path.splitdrive(part)
-        head, part = os.path.split(part)
-        if part in (os.curdir, os.pardir):
-            # Strip '.' and '..' in path.
-            continue
-        newpath = os.path.join(newpath, part).replace('\\', '/')
+    # Strip empty, '.' and '..' segments in a single pass (normpath has
+    # already collapsed everything else)
+    newpath = '/'.join(part for part in path.split('/') if part and part not in (os.curdir, os.pardir))
     if newpath and path != newpath:
         return Response(status_code=302, headers={'Location': newpath})
 
     fullpath = os.path.join(base_dir, newpath)
 
-    if not os.path.isfile(fullpath):
+    try:
+        stat_result, etag = _downloadfile_stat(fullpath)
+    except OSError:
         return build_not_found_response(request)
 
     if not getattr(settings, 'USE_XSENDFILE', False):
-        return FileResponse(fullpath, media_type='application/octet-stream')
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match is not None and etag in [tag.strip() for tag in if_none_match.split(',')]:
+            return Response(status_code=304, headers={'ETag': etag})
+
+        return FileResponse(fullpath, media_type='application/octet-stream', stat_result=stat_result)
     else:
         return Response(headers={'X-Sendfile': fullpath})
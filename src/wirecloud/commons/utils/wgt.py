@@ -25,6 +25,7 @@ from typing import Optional, IO, Union
 from urllib.request import pathname2url
 import zipfile
 
+from src.wirecloud.commons.utils.http import clear_downloadfile_cache
 from src.wirecloud.commons.utils.template import TemplateParser
 
 
@@ -204,6 +205,10 @@ class WgtDeployer:
         self._create_folders(widget_dir)
         wgt_file.extract(widget_dir)
 
+        # -dev resources are re-extracted over the same versioned directory,
+        # so any cached download metadata is stale from this point on
+        clear_downloadfile_cache()
+
         return template_parser
 
     def undeploy(self, vendor: str, name: str, version: str) -> None:
@@ -211,6 +216,7 @@ class WgtDeployer:
 
         if os.path.isdir(base_dir):
             rmtree(base_dir)
+            clear_downloadfile_cache()
 
     def _create_folders(self, widget_dir: str) -> None:
         _create_folder(self._root_dir)
@@ -45,7 +45,7 @@ async def install_resource(db: DBSession, wgt_file: WgtFile, executor_user: Opti
         if '-dev' in resource_version:
             raise PermissionDenied("dev versions cannot be published")
         vendor = template.get_resource_vendor()
-        if await check_vendor_permissions(db, executor_user, vendor) is False:
+        if check_vendor_permissions(db, executor_user, vendor) is False:
             raise PermissionDenied("You don't have persmissions to publish in name of {}".format(vendor))
 
     resource = await get_catalogue_resource(db, template.get_resource_vendor(), template.get_resource_name(), template.get_resource_version())
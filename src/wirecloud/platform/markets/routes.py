@@ -21,6 +21,7 @@ import os
 
 from bson import ObjectId
 from fastapi import APIRouter, Request, Body, Path, Response
+from pydantic import TypeAdapter
 
 from src.wirecloud.platform.markets.schemas import MarketData, MarketCreate, Market, PublishData
 from src.wirecloud.platform.markets import docs
@@ -39,6 +40,10 @@ from src.wirecloud.database import DBDep
 router = APIRouter()
 markets_router = APIRouter()
 
+# Serializes the whole market list in a single pydantic-core call instead of
+# letting FastAPI validate and encode each item separately
+market_collection_adapter: TypeAdapter = TypeAdapter(list[MarketData])
+
 
 @markets_router.get(
     "/",
@@ -69,7 +74,8 @@ async def get_market_collection(db: DBDep, user: UserDep, _request: Request):
 
         result.append(market_data)
 
-    return result
+    return Response(content=market_collection_adapter.dump_json(result),
+                    media_type="application/json")
 
 @markets_router.post(
     "/",
@@ -132,6 +132,7 @@ _wirecloud_constants: Optional[list[dict[str, str]]] = None
 _wirecloud_api_auth_backends: Optional[dict[str, Callable]] = None
 _wirecloud_tab_preferences: Optional[list[TabPreferenceKey]] = None
 _wirecloud_workspace_preferences: Optional[list[PreferenceKey]] = None
+_wirecloud_plugin_urls: Optional[dict[str, URLTemplate]] = None
 
 
 def find_wirecloud_plugins() -> list[WirecloudPlugin]:
@@ -256,6 +257,7 @@ def clear_cache() -> None:
     global _wirecloud_api_auth_backends
     global _wirecloud_tab_preferences
     global _wirecloud_workspace_preferences
+    global _wirecloud_plugin_urls
 
     _wirecloud_plugins = None
     _wirecloud_features = None
@@ -267,17 +269,23 @@ def clear_cache() -> None:
     _wirecloud_api_auth_backends = None
     _wirecloud_tab_preferences = None
     _wirecloud_workspace_preferences = None
+    _wirecloud_plugin_urls = None
 
 
 def get_plugin_urls() -> dict[str, URLTemplate]:
-    plugins = get_plugins()
+    global _wirecloud_plugin_urls
 
-    urls = {}
+    if _wirecloud_plugin_urls is None:
+        plugins = get_plugins()
 
-    for plugin in plugins:
-        urls.update(plugin.get_urls())
+        urls = {}
+
+        for plugin in plugins:
+            urls.update(plugin.get_urls())
+
+        _wirecloud_plugin_urls = urls
 
-    return urls
+    return _wirecloud_plugin_urls
 
 
 def get_wirecloud_ajax_endpoints(view: str, prefix: str) -> list[AjaxEndpoint]: